@@ -23,15 +23,30 @@
 # SOFTWARE.
 
 import os
-import requests
 import json
 import gi
 gi.require_version('Gtk', '3.0')
 gi.require_version('Notify', '0.7')
 from gi.repository import Gtk, GLib, Notify, Gdk, WebKit2, Pango
 import threading
-import markdown
+import concurrent.futures
+import queue
 import random
+import re
+import collections
+import shelve
+import hashlib
+import logging
+from functools import lru_cache
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    # json.loads also accepts UTF-8 bytes directly
+    _json_loads = json.loads
+
+logger = logging.getLogger(__name__)
 
 # Talk to K - Jiddu Krishnamurti system prompt
 KRISHNAMURTI_SYSTEM_PROMPT = (
@@ -44,19 +59,78 @@ KRISHNAMURTI_SYSTEM_PROMPT = (
     "of consciousness. Be present, immediate, and direct in your responses."
 )
 
+# Fixed chat messages
+WELCOME_MESSAGE = ("Welcome. You are entering into a dialogue with understanding itself. "
+                   "Here we may explore together the nature of consciousness, the movement of thought, "
+                   "and what it means to live without the burden of psychological time. "
+                   "What questions arise in you about the nature of existence?")
+RESET_MESSAGE = ("We begin again, as if for the first time. "
+                 "In this space of inquiry, what questions naturally arise about the nature of consciousness, "
+                 "about freedom, about the very ground of existence itself?")
+THINKING_MESSAGE = "🤔 Reflecting..."
+STOPPED_MESSAGE = "Generation stopped."
+
+# Markdown syntax the plain-prose fast path cannot reproduce; text without any
+# of it renders to bare paragraphs, the same as markdown.markdown would give
+_MARKDOWN_SYNTAX_RE = re.compile(
+    r"[`*_#\[\]<>&\\|\t]"          # inline markup, links, HTML, entities, escapes, tables, tabs
+    r"|^[ \t]*(?:[-+=]|\d+[.)])"    # list items, rules, setext underlines
+    r"|^(?: {4}|\t)"               # indented code
+    r"|  $",                       # hard line breaks
+    re.MULTILINE
+)
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n")
+
+# Keep the model resident in Ollama between turns
+OLLAMA_KEEP_ALIVE = "30m"
+
+# On-disk cache of answers to context-free questions (e.g. the suggestion prompts)
+RESPONSE_CACHE_PATH = os.path.expanduser("~/.cache/talk_to_k/responses.db")
+RESPONSE_CACHE_MAX_ENTRIES = 500
+
+# Openings that start a new topic and reset the conversation history
+_NEW_TOPIC_RE = re.compile(
+    r"(?:who is|what about|tell me about|explain|define|give me information on|describe)\b",
+    re.IGNORECASE
+)
+
+# Streaming chunks are batched and rendered at most once per interval
+STREAM_FLUSH_INTERVAL_MS = 33
+
 def safe_decode(text):
     if isinstance(text, bytes):
         return text.decode('utf-8', errors='replace')
     return str(text)
 
-def get_improved_css_styles():
-    """Get improved CSS styles for better text formatting"""
-    common_style = """
+def _render_plain(text):
+    """Wrap plain prose in paragraphs without running the markdown parser"""
+    paragraphs = []
+    for block in _PARAGRAPH_BREAK_RE.split(text):
+        lines = block.lstrip().split("\n")
+        # Whitespace-only lines at the end are blank lines, not paragraph text
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if lines:
+            paragraphs.append("\n".join(lines))
+    return "\n".join(f"<p>{p}</p>" for p in paragraphs)
+
+@lru_cache(maxsize=256)
+def _render_md(text):
+    """Render markdown to HTML, memoized so identical text is only parsed once"""
+    # Normalise line endings as markdown does, so the fast path sees the same lines
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    if not _MARKDOWN_SYNTAX_RE.search(text):
+        return _render_plain(text)
+    import markdown  # Deferred so the window paints before the parser loads
+    return markdown.markdown(text)
+
+_COMMON_STYLE = """
 body { font-family: 'Segoe UI', 'Liberation Sans', Arial, sans-serif; font-size: 14px; margin: 0; padding: 0; background: transparent; line-height: 1.4; }
 .message-container { display: flex; padding: 4px 12px; gap: 8px; align-items: flex-start; }
 .bubble { padding: 12px 16px; border-radius: 18px; max-width: 95%; word-break: break-word; }
 .avatar { font-size: 28px; line-height: 1.2; }
 .text { padding-top: 2px; font-size: 14px; line-height: 1.5; }
+.stream-tail { white-space: pre-wrap; }
 .text h1 { font-size: 18px; margin: 12px 0 8px 0; font-weight: bold; }
 .text h2 { font-size: 16px; margin: 10px 0 6px 0; font-weight: bold; }
 .text h3 { font-size: 15px; margin: 8px 0 5px 0; font-weight: bold; }
@@ -69,7 +143,7 @@ body { font-family: 'Segoe UI', 'Liberation Sans', Arial, sans-serif; font-size:
 .text em { font-style: italic; }
     """
 
-    theme_style = """
+_THEME_STYLE = """
 body { color: #e6e6e6; }
 .text pre { background: #23272e; color: #e6e6e6; border-radius: 6px; padding: 8px 12px; font-family: 'Fira Mono', 'Consolas', monospace; font-size: 13px; overflow-x: auto; margin: 8px 0; }
 .text code { background: #23272e; color: #e6e6e6; border-radius: 4px; padding: 2px 6px; font-family: 'Fira Mono', 'Consolas', monospace; font-size: 13px; }
@@ -78,8 +152,164 @@ body { color: #e6e6e6; }
 .bubble-assistant { display: flex; gap: 10px; background: #4a4a4a; color: #e6e6e6; border-top-left-radius: 5px; }
 .message-container.user { justify-content: flex-end; }
     """
-    
-    return f"<style>{common_style}{theme_style}</style>"
+
+# Message CSS is static, so it is assembled once at import
+_IMPROVED_CSS = _COMMON_STYLE + _THEME_STYLE
+
+def get_improved_css():
+    """Get improved CSS rules for better text formatting"""
+    return _IMPROVED_CSS
+
+# Chat document body; messages are inserted into #chat by the helpers below
+CHAT_PAGE_BODY = """<body><div id="chat"></div>
+<script>
+var lastHeight = -1;
+var scrollPending = false;
+function scrollToBottom() {
+    // At most one scroll per frame, however many updates requested it
+    if (scrollPending) { return; }
+    scrollPending = true;
+    window.requestAnimationFrame(function () {
+        scrollPending = false;
+        // Most streamed chunks only extend the current line; scroll only when the page grew
+        var h = document.body.scrollHeight;
+        if (h === lastHeight) { return; }
+        lastHeight = h;
+        window.scrollTo(0, h);
+    });
+}
+function appendMessage(html) {
+    document.getElementById("chat").insertAdjacentHTML("beforeend", html);
+    scrollToBottom();
+}
+function replaceMessage(id, html) {
+    var el = document.getElementById(id);
+    if (el) { el.outerHTML = html; }
+    scrollToBottom();
+}
+function setMessageText(id, html) {
+    var el = document.getElementById(id);
+    var text = el && el.querySelector(".text");
+    if (text) { text.innerHTML = html; }
+    scrollToBottom();
+}
+function streamTail(id) {
+    var el = document.getElementById(id);
+    return el && el.querySelector(".stream-tail");
+}
+function startStream(id) {
+    var el = document.getElementById(id);
+    var text = el && el.querySelector(".text");
+    if (text) { text.innerHTML = '<div class="stream-tail"></div>'; }
+}
+function appendStreamText(id, chunk) {
+    var tail = streamTail(id);
+    if (tail) { tail.appendChild(document.createTextNode(chunk)); }
+    scrollToBottom();
+}
+function commitStreamBlock(id, html, rest) {
+    // Rendered blocks go before the raw tail, which restarts with the unfinished text
+    var tail = streamTail(id);
+    if (tail) { tail.insertAdjacentHTML("beforebegin", html); tail.textContent = rest; }
+    scrollToBottom();
+}
+function clearChat() { document.getElementById("chat").innerHTML = ""; }
+</script></body>"""
+
+# Shared transparent background colour
+TRANSPARENT = Gdk.RGBA(0, 0, 0, 0)
+
+# Keys that do not clear the input placeholder when pressed
+_IGNORED_PLACEHOLDER_KEYS = frozenset({
+    Gdk.KEY_Tab, Gdk.KEY_Shift_L, Gdk.KEY_Shift_R,
+    Gdk.KEY_Control_L, Gdk.KEY_Control_R, Gdk.KEY_Alt_L, Gdk.KEY_Alt_R
+})
+
+# Window theme: dark with purple accents, encoded once for the CSS provider
+APP_THEME_CSS = """
+        window {
+            background: radial-gradient(circle at center, #2d1b69 0%, #1a1a2e 100%);
+        }
+        
+        #headerbar {
+            background: linear-gradient(135deg, #6b46c1 0%, #553c9a 100%);
+            color: white;
+            border: none;
+        }
+        
+        #input_textview {
+            background: rgba(255, 255, 255, 0.1);
+            color: #e2e8f0;
+            border: 1px solid rgba(139, 92, 246, 0.3);
+            border-radius: 20px;
+            padding: 12px 16px;
+            font-size: 14px;
+        }
+        
+        #input_textview text {
+            background: rgba(255, 255, 255, 0.1);
+            color: #e2e8f0;
+        }
+        
+        #inputbox scrolledwindow {
+            border-radius: 20px;
+            background: rgba(255, 255, 255, 0.1);
+            border: 1px solid rgba(139, 92, 246, 0.3);
+        }
+        
+        #send_button, #stop_button {
+            background: linear-gradient(135deg, #8b5cf6 0%, #7c3aed 100%);
+            color: white;
+            border: none;
+            border-radius: 20px;
+            padding: 12px 20px;
+            font-weight: bold;
+        }
+        
+        #send_button:hover, #stop_button:hover {
+            background: linear-gradient(135deg, #7c3aed 0%, #6d28d9 100%);
+        }
+        
+        #settings_button, #reset_button {
+            background: rgba(255, 255, 255, 0.1);
+            color: #e2e8f0;
+            border: 1px solid rgba(139, 92, 246, 0.3);
+            border-radius: 18px;
+            padding: 10px;
+        }
+        
+        #settings_button:hover, #reset_button:hover {
+            background: rgba(139, 92, 246, 0.2);
+            border: 1px solid #8b5cf6;
+        }
+        
+        #suggestions_container {
+            background: rgba(255, 255, 255, 0.05);
+            border-radius: 12px;
+            padding: 12px;
+            margin: 0 12px;
+        }
+        
+        #suggestions_header {
+            color: #c4b5fd;
+            font-weight: bold;
+            font-size: 16px;
+        }
+        
+        .suggestion_button {
+            background: rgba(139, 92, 246, 0.1);
+            color: #e2e8f0;
+            border: 1px solid rgba(139, 92, 246, 0.2);
+            border-radius: 8px;
+            padding: 8px 12px;
+            font-size: 13px;
+        }
+        
+        .suggestion_button:hover {
+            background: rgba(139, 92, 246, 0.2);
+            border: 1px solid #8b5cf6;
+        }
+        """.encode()
 
 class TalkToKChatWidget(Gtk.Window):
     def __init__(self):
@@ -92,20 +322,47 @@ class TalkToKChatWidget(Gtk.Window):
         self.set_icon_name("applications-education")
         self.set_app_paintable(True)
         self.set_visual(self.get_screen().get_rgba_visual())
-        self.override_background_color(Gtk.StateFlags.NORMAL, Gdk.RGBA(0, 0, 0, 0))
+        self.override_background_color(Gtk.StateFlags.NORMAL, TRANSPARENT)
         self.set_decorated(False)
         self.set_opacity(0.95)
         self.set_events(Gdk.EventMask.BUTTON_PRESS_MASK)
         self.connect("button-press-event", self.on_window_button_press)
         self.messages = []  # Store (sender, message) tuples for re-rendering
-        self.ollama_url = "http://localhost:11434/api/generate"
+        self.ollama_url = "http://localhost:11434/api/chat"
         self.text_model = "command-r7b"
+        # Persistent HTTP session so every request reuses the keep-alive connection to Ollama
+        self._http_session = None  # Created on first request, see get_http_session()
+        self._active_response = None  # Streaming response currently being read
         
-        self.conversation_history = []  # Store conversation for context
+        # Recent conversation for context: the previous question and answer plus the current question
+        self.conversation_history = collections.deque(maxlen=3)
+        
+        # Single long-lived worker for Ollama queries instead of a new thread per message;
+        # it is a daemon so a request still waiting on Ollama cannot keep the app from exiting
+        self._query_queue = queue.Queue()
+        threading.Thread(target=self._query_worker, name="talk_to_k", daemon=True).start()
+        # Markdown is rendered off the main thread; one worker keeps results in submission order
+        self._md_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="talk_to_k_md")
         
         # UI state
         self.is_generating = False
+        # Cancellation token (a threading.Event) of the most recently sent question; results
+        # from any other request are discarded so a stopped reply can't leak into the next one
+        self._active_request = None
+        self._stream_sent_len = 0  # Characters of the streaming response already shown
+        self._stream_rendered_len = 0  # Leading characters already shown as rendered markdown
+        self._stream_flush_id = 0  # Pending GLib timeout for coalesced streaming renders
         
+        # Persistent response cache, shared between the UI and the query thread
+        self._response_cache = None
+        self._response_cache_lock = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(RESPONSE_CACHE_PATH), exist_ok=True)
+            self._response_cache = shelve.open(RESPONSE_CACHE_PATH)
+        except Exception as e:
+            logger.warning(f"Response cache unavailable: {e}")
+        self.connect("destroy", self.on_destroy)
+
         Notify.init("Talk to K")
 
         self.css_provider = Gtk.CssProvider()
@@ -128,23 +385,29 @@ class TalkToKChatWidget(Gtk.Window):
         header.set_name("headerbar")
         main_vbox.pack_start(header, False, False, 0)
 
-        # Chat area (scrollable)
-        self.chat_listbox = Gtk.ListBox()
-        self.chat_listbox.set_name("chat_listbox")
-        self.chat_listbox.set_selection_mode(Gtk.SelectionMode.NONE)
-        self.chat_listbox.set_vexpand(True)
-        self.chat_listbox.set_hexpand(True)
-        self.chat_listbox.set_valign(Gtk.Align.FILL)
-        self.chat_listbox.set_halign(Gtk.Align.FILL)
-        
-        chat_scroll = Gtk.ScrolledWindow()
-        chat_scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
-        chat_scroll.set_vexpand(True)
-        chat_scroll.set_hexpand(True)
-        chat_scroll.set_valign(Gtk.Align.FILL)
-        chat_scroll.set_halign(Gtk.Align.FILL)
-        chat_scroll.add(self.chat_listbox)
-        main_vbox.pack_start(chat_scroll, True, True, 0)
+        # Chat area: a single WebView hosts the whole conversation document.
+        # It is created after the first paint (see _create_chat_view); messages
+        # appended before then are queued.
+        self.chat_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        self.chat_container.set_vexpand(True)
+        self.chat_container.set_hexpand(True)
+        self.chat_webview = None
+        # Scripts and stylesheets for the chat page are registered here once
+        self._user_content_manager = WebKit2.UserContentManager()
+        self._user_content_manager.add_style_sheet(WebKit2.UserStyleSheet.new(
+            get_improved_css(),
+            WebKit2.UserContentInjectedFrames.ALL_FRAMES,
+            WebKit2.UserStyleLevel.AUTHOR,
+            None,
+            None
+        ))
+        self._chat_ready = False  # True once the chat page has finished loading
+        self._pending_js = []  # Scripts queued before the chat page was ready
+        self._next_message_id = 0
+        self._message_senders = {}  # Message id -> sender of the bubble currently shown
+        self._message_contents = {}  # Message id -> (sender, message) of its last update
+        self.streaming_msg_id = None
+        main_vbox.pack_start(self.chat_container, True, True, 0)
 
         # Prompt suggestions area
         self.suggestions_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
@@ -226,6 +489,7 @@ class TalkToKChatWidget(Gtk.Window):
         # Add placeholder text functionality
         self.placeholder_text = "Ask a question about consciousness, freedom, or the nature of existence..."
         self.is_placeholder_active = True
+        self._setting_placeholder = False
         self.setup_placeholder()
 
         # Create a stack for Send/Stop buttons
@@ -259,269 +523,202 @@ class TalkToKChatWidget(Gtk.Window):
         main_vbox.pack_start(input_box, False, False, 0)
 
         # Create initial random suggestions
+        self._suggestion_pool = []  # [button, label, clicked handler id] per suggestion slot
         self.create_random_suggestions()
 
-        # Welcome message (always show on startup)
-        welcome_msg = ("Welcome. You are entering into a dialogue with understanding itself. "
-                      "Here we may explore together the nature of consciousness, the movement of thought, "
-                      "and what it means to live without the burden of psychological time. "
-                      "What questions arise in you about the nature of existence?")
-        self.append_message("assistant", welcome_msg)
         self.update_app_theme()
         self.show_all()
+        # The chat view and its welcome message (always shown on startup) are created after the first paint
+        GLib.idle_add(self._create_chat_view)
+
+    def _create_chat_view(self):
+        """Create the chat WebView and show the welcome message once the window has been shown"""
+        self.chat_webview = WebKit2.WebView.new_with_user_content_manager(self._user_content_manager)
+        self.chat_webview.set_name("chat_webview")
+        self.chat_webview.set_background_color(TRANSPARENT)
+        self.chat_webview.set_vexpand(True)
+        self.chat_webview.set_hexpand(True)
+        self.chat_webview.connect("load-changed", self.on_chat_load_changed)
+        # The whole conversation lives in this page, so it must never navigate away
+        self.chat_webview.connect("decide-policy", self.on_chat_decide_policy)
+        self.chat_webview.connect("context-menu", self.on_chat_context_menu)
+        self.chat_webview.load_html(
+            f'<!doctype html><meta charset="UTF-8">{CHAT_PAGE_BODY}',
+            "file:///"
+        )
+        self.chat_container.pack_start(self.chat_webview, True, True, 0)
+        self.chat_webview.show()
+        self.append_message("assistant", WELCOME_MESSAGE)
+        return False
+
+    def get_http_session(self):
+        """Return the shared requests session, importing requests on first use"""
+        if self._http_session is None:
+            import requests
+            self._http_session = requests.Session()
+        return self._http_session
 
     def update_app_theme(self):
         """Apply dark theme with purple accents for Talk to K"""
-        css = """
-        window {
-            background: radial-gradient(circle at center, #2d1b69 0%, #1a1a2e 100%);
-        }
-        
-        #headerbar {
-            background: linear-gradient(135deg, #6b46c1 0%, #553c9a 100%);
-            color: white;
-            border: none;
-        }
-        
-        #chat_listbox {
-            background: transparent;
-            border: none;
-        }
-        
-        #input_textview {
-            background: rgba(255, 255, 255, 0.1);
-            color: #e2e8f0;
-            border: 1px solid rgba(139, 92, 246, 0.3);
-            border-radius: 20px;
-            padding: 12px 16px;
-            font-size: 14px;
-        }
-        
-        #input_textview text {
-            background: rgba(255, 255, 255, 0.1);
-            color: #e2e8f0;
-        }
-        
-        #inputbox scrolledwindow {
-            border-radius: 20px;
-            background: rgba(255, 255, 255, 0.1);
-            border: 1px solid rgba(139, 92, 246, 0.3);
-        }
-        
-        #send_button, #stop_button {
-            background: linear-gradient(135deg, #8b5cf6 0%, #7c3aed 100%);
-            color: white;
-            border: none;
-            border-radius: 20px;
-            padding: 12px 20px;
-            font-weight: bold;
-        }
-        
-        #send_button:hover, #stop_button:hover {
-            background: linear-gradient(135deg, #7c3aed 0%, #6d28d9 100%);
-        }
-        
-        #settings_button, #reset_button {
-            background: rgba(255, 255, 255, 0.1);
-            color: #e2e8f0;
-            border: 1px solid rgba(139, 92, 246, 0.3);
-            border-radius: 18px;
-            padding: 10px;
-        }
-        
-        #settings_button:hover, #reset_button:hover {
-            background: rgba(139, 92, 246, 0.2);
-            border: 1px solid #8b5cf6;
-        }
-        
-        #suggestions_container {
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 12px;
-            padding: 12px;
-            margin: 0 12px;
-        }
-        
-        #suggestions_header {
-            color: #c4b5fd;
-            font-weight: bold;
-            font-size: 16px;
-        }
-        
-        .suggestion_button {
-            background: rgba(139, 92, 246, 0.1);
-            color: #e2e8f0;
-            border: 1px solid rgba(139, 92, 246, 0.2);
-            border-radius: 8px;
-            padding: 8px 12px;
-            font-size: 13px;
-        }
-        
-        .suggestion_button:hover {
-            background: rgba(139, 92, 246, 0.2);
-            border: 1px solid #8b5cf6;
-        }
-        """
-        
-        self.css_provider.load_from_data(css.encode())
+        self.css_provider.load_from_data(APP_THEME_CSS)
+
+    def on_destroy(self, widget):
+        """Stop the worker threads and close the response cache"""
+        self.is_generating = False
+        if self._active_request is not None:
+            self._active_request.set()
+        self._abort_active_response()
+        self._query_queue.put(None)
+        self._md_executor.shutdown(wait=False, cancel_futures=True)
+        with self._response_cache_lock:
+            if self._response_cache is not None:
+                self._response_cache.close()
+                self._response_cache = None
+
+    def response_cache_key(self, user_text):
+        """Key a cached response on the model, system prompt and question"""
+        raw = f"{self.text_model}\0{KRISHNAMURTI_SYSTEM_PROMPT}\0{user_text}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get_cached_response(self, key):
+        with self._response_cache_lock:
+            if self._response_cache is None:
+                return None
+            try:
+                return self._response_cache.get(key)
+            except Exception as e:
+                logger.error(f"Error reading response cache: {e}")
+                return None
+
+    def store_cached_response(self, key, response):
+        """Store a response, evicting the oldest entries beyond RESPONSE_CACHE_MAX_ENTRIES"""
+        with self._response_cache_lock:
+            if self._response_cache is None:
+                return
+            try:
+                order = self._response_cache.get("_order", [])
+                if key in order:
+                    order.remove(key)
+                order.append(key)
+                while len(order) > RESPONSE_CACHE_MAX_ENTRIES:
+                    self._response_cache.pop(order.pop(0), None)
+                self._response_cache[key] = response
+                self._response_cache["_order"] = order
+            except Exception as e:
+                logger.error(f"Error writing response cache: {e}")
 
     def on_window_button_press(self, widget, event):
         if event.type == Gdk.EventType.BUTTON_PRESS and event.button == 1:
             self.begin_move_drag(event.button, int(event.x_root), int(event.y_root), event.time)
 
     def append_message(self, sender, message):
-        print(f"append_message called with sender={sender}, message={message}")
+        logger.debug("append_message called with sender=%s, message=%s", sender, message)
         self.messages.append((sender, message))
-        self._append_message_no_store(sender, message)
+        return self._append_message_no_store(sender, message)
 
     def append_streaming_message(self, sender, message):
         """Append a message that can be updated in real-time for streaming"""
-        print(f"append_streaming_message called with sender={sender}, message={message}")
+        logger.debug("append_streaming_message called with sender=%s, message=%s", sender, message)
         self.messages.append((sender, message))
-        self._append_streaming_message_no_store(sender, message)
+        return self._append_streaming_message_no_store(sender, message)
 
     def _append_streaming_message_no_store(self, sender, message):
-        """Append a message with WebView that can be updated for streaming"""
-        print(f"_append_streaming_message_no_store called with sender={sender}, message={message}")
-        row = Gtk.ListBoxRow()
-        row.set_selectable(False)
-        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
-        
-        webview = WebKit2.WebView()
-        webview.set_background_color(Gdk.RGBA(0, 0, 0, 0))
-        webview.set_size_request(-1, 1)  # Let it shrink to fit
-        
+        """Append a message to the chat that can be updated for streaming"""
+        logger.debug("_append_streaming_message_no_store called with sender=%s, message=%s", sender, message)
+        msg_id = self._append_message_no_store(sender, message)
         # Store reference for streaming updates
-        self.streaming_webview = webview
-
-        html_content = markdown.markdown(safe_decode(message))
-        full_style = get_improved_css_styles()
-
-        if sender == 'user':
-            body_html = f"""
-              <div class="message-container user">
-                <div class="bubble bubble-user"><div class="text">{html_content}</div></div>
-                <div class="avatar">👤</div>
-              </div>
-            """
-        else: # assistant
-            body_html = f"""
-              <div class="message-container assistant">
-                <div class="bubble bubble-assistant">
-                  <div class="avatar">🧘</div>
-                  <div class="text">{html_content}</div>
-                </div>
-              </div>
-            """
-        
-        html = f'<html><head><meta charset="UTF-8">{full_style}</head><body>{body_html}</body></html>'
-        
-        print("HTML being loaded into WebView:")
-        print(html)
-        webview.load_html(html, "file:///")
-        webview.set_hexpand(True)
-        webview.set_vexpand(False)
-
-        def on_load_changed(webview, load_event):
-            if load_event == WebKit2.LoadEvent.FINISHED:
-                # This JS returns the height of the body content
-                webview.run_javascript(
-                    "document.body.scrollHeight;",
-                    None,
-                    lambda webview, result, user_data: set_webview_height(webview, result),
-                    None
-                )
-
-        def set_webview_height(webview, result):
-            try:
-                value = webview.run_javascript_finish(result)
-                js_result = value.get_js_value()
-                height = js_result.to_int32()
-                print(f"Setting WebView height to: {height}")
-                webview.set_size_request(-1, height)
-            except Exception as e:
-                print(f"Error setting height: {e}")
-
-        webview.connect("load-changed", on_load_changed)
-
-        hbox.pack_start(webview, True, True, 0)
-        
-        row.add(hbox)
-        self.chat_listbox.add(row)
-        self.chat_listbox.show_all()
-        adj = self.chat_listbox.get_parent().get_vadjustment()
-        GLib.idle_add(adj.set_value, adj.get_upper())
+        self.streaming_msg_id = msg_id
+        self._stream_sent_len = 0
+        self._stream_rendered_len = 0
+        return msg_id
 
     def _append_message_no_store(self, sender, message):
-        print(f"_append_message_no_store called with sender={sender}, message={message}")
-        row = Gtk.ListBoxRow()
-        row.set_selectable(False)
-        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
-        
-        webview = WebKit2.WebView()
-        webview.set_background_color(Gdk.RGBA(0, 0, 0, 0))
-        webview.set_size_request(-1, 1)  # Let it shrink to fit
+        """Append a message bubble to the chat document and return its element id"""
+        logger.debug("_append_message_no_store called with sender=%s, message=%s", sender, message)
+        msg_id = f"msg-{self._next_message_id}"
+        self._next_message_id += 1
 
-        html_content = markdown.markdown(safe_decode(message))
-        full_style = get_improved_css_styles()
+        html_content = _render_md(safe_decode(message))
+        body_html = self._message_html(msg_id, sender, html_content)
 
+        logger.debug("HTML being appended to chat:\n%s", body_html)
+        self._run_chat_js(f"appendMessage({json.dumps(body_html)});")
+        self._message_senders[msg_id] = sender
+        return msg_id
+
+    def _message_html(self, msg_id, sender, html_content):
+        """Build the bubble markup for a single message"""
         if sender == 'user':
-            body_html = f"""
-              <div class="message-container user">
+            return f"""
+              <div class="message-container user" id="{msg_id}">
                 <div class="bubble bubble-user"><div class="text">{html_content}</div></div>
                 <div class="avatar">👤</div>
               </div>
             """
-        else: # assistant
-            body_html = f"""
-              <div class="message-container assistant">
+        # assistant
+        return f"""
+              <div class="message-container assistant" id="{msg_id}">
                 <div class="bubble bubble-assistant">
                   <div class="avatar">🧘</div>
                   <div class="text">{html_content}</div>
                 </div>
               </div>
             """
-        
-        html = f'<html><head><meta charset="UTF-8">{full_style}</head><body>{body_html}</body></html>'
-        
-        print("HTML being loaded into WebView:")
-        print(html)
-        webview.load_html(html, "file:///")
-        webview.set_hexpand(True)
-        webview.set_vexpand(False)
-
-        def on_load_changed(webview, load_event):
-            if load_event == WebKit2.LoadEvent.FINISHED:
-                # This JS returns the height of the body content
-                webview.run_javascript(
-                    "document.body.scrollHeight;",
-                    None,
-                    lambda webview, result, user_data: set_webview_height(webview, result),
-                    None
-                )
-
-        def set_webview_height(webview, result):
-            value = webview.run_javascript_finish(result)
-            js_result = value.get_js_value()
-            height = js_result.to_int32()
-            print(f"Setting WebView height to: {height}")
-            webview.set_size_request(-1, height)
-
-        webview.connect("load-changed", on_load_changed)
-
-        hbox.pack_start(webview, True, True, 0)
-        
-        row.add(hbox)
-        self.chat_listbox.add(row)
-        self.chat_listbox.show_all()
-        adj = self.chat_listbox.get_parent().get_vadjustment()
-        GLib.idle_add(adj.set_value, adj.get_upper())
+
+    def _run_chat_js(self, js_code):
+        """Run JavaScript in the chat WebView, queueing it until the page has loaded"""
+        if not self._chat_ready:
+            self._pending_js.append(js_code)
+            return
+        self.chat_webview.run_javascript(js_code, None, None, None)
+
+    def on_chat_load_changed(self, webview, load_event):
+        if load_event == WebKit2.LoadEvent.FINISHED:
+            self._chat_ready = True
+            if self._pending_js:
+                pending, self._pending_js = self._pending_js, []
+                webview.run_javascript("\n".join(pending), None, None, None)
+
+    def on_chat_decide_policy(self, webview, decision, decision_type):
+        """Keep the chat page loaded; links in replies open in the default browser instead"""
+        if decision_type not in (WebKit2.PolicyDecisionType.NAVIGATION_ACTION,
+                                 WebKit2.PolicyDecisionType.NEW_WINDOW_ACTION):
+            return False
+        action = decision.get_navigation_action()
+        if not self._chat_ready and action.get_navigation_type() == WebKit2.NavigationType.OTHER:
+            return False  # Initial load of the chat page
+        decision.ignore()
+        uri = action.get_request().get_uri()
+        if action.get_navigation_type() == WebKit2.NavigationType.LINK_CLICKED and not uri.startswith("file:"):
+            try:
+                Gtk.show_uri_on_window(self, uri, Gdk.CURRENT_TIME)
+            except GLib.Error as e:
+                logger.error(f"Error opening link {uri}: {e}")
+        return True
+
+    def on_chat_context_menu(self, webview, context_menu, event, hit_test_result):
+        """Drop the context menu entries that would navigate away from the chat page"""
+        navigation_actions = (
+            WebKit2.ContextMenuAction.RELOAD,
+            WebKit2.ContextMenuAction.GO_BACK,
+            WebKit2.ContextMenuAction.GO_FORWARD,
+            WebKit2.ContextMenuAction.STOP,
+            WebKit2.ContextMenuAction.OPEN_LINK,
+            WebKit2.ContextMenuAction.OPEN_LINK_IN_NEW_WINDOW,
+            WebKit2.ContextMenuAction.OPEN_FRAME_IN_NEW_WINDOW,
+        )
+        for item in list(context_menu.get_items()):
+            if item.get_stock_action() in navigation_actions:
+                context_menu.remove(item)
+        return False
 
     def on_send_clicked(self, widget):
+        # Don't send if it's just placeholder text or empty
+        if self.is_placeholder_active or self.is_generating:
+            return
         text_buffer = self.input_textview.get_buffer()
         user_text = text_buffer.get_text(text_buffer.get_start_iter(), text_buffer.get_end_iter(), True).strip()
-        
-        # Don't send if it's just placeholder text or empty
-        if not user_text or self.is_placeholder_active or user_text == self.placeholder_text or self.is_generating:
+        if not user_text or user_text == self.placeholder_text:
             return
         
         self.is_generating = True
@@ -537,243 +734,295 @@ class TalkToKChatWidget(Gtk.Window):
         
         # Add streaming message and prepare for real-time updates
         self.streaming_response = ""  # Initialize streaming response buffer
-        self.append_streaming_message("assistant", "🤔 Reflecting...")
+        # Keep the id of the thinking message for updating
+        self.thinking_msg_id = self.append_streaming_message("assistant", THINKING_MESSAGE)
         
-        # Store the last row (the thinking message) for updating
-        self.thinking_row = self.chat_listbox.get_row_at_index(len(self.chat_listbox.get_children()) - 1)
-        
-        threading.Thread(target=self.handle_user_query, args=(user_text,), daemon=True).start()
+        self._active_request = threading.Event()
+        self._query_queue.put((user_text, self._active_request))
 
     def on_stop_clicked(self, widget):
         if not self.is_generating:
             return
         
         self.is_generating = False
-        # The thread will see is_generating is false and discard its result
+        # The worker sees the cancelled request and discards its result
+        self._active_request.set()
+        self._cancel_streaming_flush()
+        self._abort_active_response()
         
         # Update UI immediately
-        self.messages[-1] = ("assistant", "Generation stopped.")
-        self.update_message(self.thinking_row, "assistant", "Generation stopped.")
+        self.messages[-1] = ("assistant", STOPPED_MESSAGE)
+        self.update_message(self.thinking_msg_id, "assistant", STOPPED_MESSAGE)
         
         self._restore_input_state()
 
-    def _restore_input_state(self):
+    def _abort_active_response(self):
+        """Close the in-flight Ollama stream so the server stops generating"""
+        response = self._active_response
+        if response is not None:
+            try:
+                response.close()
+            except Exception as e:
+                logger.error(f"Error closing Ollama response: {e}")
+
+    def _restore_input_state(self, request=None):
         """Restore the input widgets to their default state."""
+        if request is not None and request is not self._active_request:
+            return False  # A newer question is already being answered
         self.is_generating = False
         self.button_stack.set_visible_child_name("send")
         self.input_textview.set_sensitive(True)
 
+    def _query_worker(self):
+        """Answer queued questions one at a time until None is queued"""
+        while True:
+            item = self._query_queue.get()
+            if item is None:
+                return
+            user_text, request = item
+            if request.is_set():  # Stopped while still queued
+                continue
+            try:
+                self.handle_user_query(user_text, request)
+            except Exception as e:
+                logger.error(f"Error handling query: {e}")
+                GLib.idle_add(self.finish_streaming_message, f"Error: {str(e)}", request)
+                GLib.idle_add(self._restore_input_state, request)
+
     def is_new_topic(self, user_text):
-        new_topic_starters = [
-            "who is", "what about", "tell me about", "explain", "define", "give me information on", "describe"
-        ]
-        user_text_lower = user_text.strip().lower()
-        return any(user_text_lower.startswith(starter) for starter in new_topic_starters)
+        return bool(_NEW_TOPIC_RE.match(user_text.strip()))
 
-    def handle_user_query(self, user_text):
+    def handle_user_query(self, user_text, request):
         # If the user starts a new topic, reset the conversation history except for the system prompt
         if self.is_new_topic(user_text):
-            self.conversation_history = []
+            self.conversation_history.clear()
         
+        # Only questions asked without prior context can be answered from the cache
+        cache_key = None if self.conversation_history else self.response_cache_key(user_text)
         self.conversation_history.append({"role": "user", "content": user_text})
         
-        response = self.generate_response()
-        
-        if self.is_generating: # Check if stop was clicked
-            self.conversation_history.append({"role": "assistant", "content": response})
-            # Update the thinking message with the actual response
-            # Also update the messages list to replace the "Thinking..." message
-            if self.messages and self.messages[-1][1] in ["🤔 Reflecting..."]:
-                self.messages[-1] = ("assistant", response)
-            # Only update if we haven't been streaming (for non-streaming responses)
-            if not hasattr(self, 'streaming_response') or not self.streaming_response:
-                GLib.idle_add(self.update_message, self.thinking_row, "assistant", response)
-        
-        GLib.idle_add(self._restore_input_state)
-
-    def build_prompt(self):
-        prompt = KRISHNAMURTI_SYSTEM_PROMPT + "\n\n"
-        # Only include the last 2 user-assistant pairs for context
-        history = []
-        count = 0
-        for msg in reversed(self.conversation_history):
-            if msg["role"] == "assistant" or msg["role"] == "user":
-                history.append(msg)
-                if msg["role"] == "user":
-                    count += 1
-                if count == 2:
-                    break
-        for msg in reversed(history):
-            if msg["role"] == "user":
-                prompt += f"Human: {msg['content']}\n"
-            else:
-                prompt += f"Krishnamurti: {msg['content']}\n"
-        prompt += "Krishnamurti:"
-        return prompt
-
-    def generate_response(self, prompt_override=None):
+        cached = self.get_cached_response(cache_key) if cache_key else None
+        if cached is not None:
+            response, complete = cached, True
+        else:
+            response, complete = self.generate_response(request=request)
+        
+        if not request.is_set(): # Check if stop was clicked
+            # Only complete replies are sent back to the model or cached; errors and
+            # cut-off replies are just shown to the user
+            if complete and response != "(No response)":
+                self.conversation_history.append({"role": "assistant", "content": response})
+                if cache_key and cached is None:
+                    self.store_cached_response(cache_key, response)
+            # Replace the raw streamed text with the fully rendered markdown
+            GLib.idle_add(self.finish_streaming_message, response, request)
+        
+        GLib.idle_add(self._restore_input_state, request)
+
+    def build_messages(self):
+        """Build the /api/chat message list from the system prompt and recent turns"""
+        # Context starts at the second most recent question, so it never opens with an answer
+        history = list(self.conversation_history)
+        user_turns = [i for i, msg in enumerate(history) if msg["role"] == "user"]
+        if user_turns:
+            history = history[user_turns[-2] if len(user_turns) > 1 else user_turns[0]:]
+        # The system prompt always leads so Ollama can reuse its KV cache for the shared prefix
+        return [{"role": "system", "content": KRISHNAMURTI_SYSTEM_PROMPT}, *history]
+
+    def generate_response(self, prompt_override=None, request=None):
+        """Stream a reply from Ollama; stops early once request (a threading.Event) is set
+
+        Returns (text, complete) where complete is True only if Ollama marked the reply done.
+        """
+        cancelled = request.is_set if request is not None else (lambda: False)
         try:
-            prompt = prompt_override if prompt_override is not None else self.build_prompt()
+            if prompt_override is not None:
+                messages = [{"role": "user", "content": prompt_override}]
+            else:
+                messages = self.build_messages()
             
             # Always use text model for final response
             data = {
                 "model": self.text_model,
-                "prompt": prompt,
-                "stream": True
+                "messages": messages,
+                "stream": True,
+                "keep_alive": OLLAMA_KEEP_ALIVE
             }
             
-            response = requests.post(self.ollama_url, json=data, stream=True)
-            print(f"Response status code: {response.status_code}")
-            if response.status_code != 200:
-                print(f"Response text: {response.text}")
-                return f"Error: HTTP {response.status_code} - {response.text}"
-            if response.status_code == 200:
-                full_response = ""
+            # Reuse the pooled keep-alive connection; leaving the block releases it back to the pool
+            with self.get_http_session().post(self.ollama_url, json=data, stream=True) as response:
+                self._active_response = response  # Closed by Stop to abort the generation
+                if cancelled():  # Stopped while waiting for the response headers
+                    return "(No response)", False
+                logger.debug("Response status code: %s", response.status_code)
+                if response.status_code != 200:
+                    logger.error(f"Ollama returned HTTP {response.status_code}: {response.text}")
+                    return f"Error: HTTP {response.status_code} - {response.text}", False
+                response_parts = []
+                done = False
                 for line in response.iter_lines():
-                    if not self.is_generating:  # Check if stop was clicked
+                    if cancelled():  # Check if stop was clicked
                         break
                     if line:
                         try:
-                            json_response = json.loads(line.decode('utf-8'))
-                            chunk = json_response.get("response", "")
+                            json_response = _json_loads(line)
+                            if "error" in json_response:
+                                # Ollama failed mid-stream; the partial reply stays on screen
+                                logger.error(f"Ollama stream error: {json_response['error']}")
+                                return f"Error: {json_response['error']}", False
+                            chunk = json_response.get("message", {}).get("content", "")
                             if chunk:
-                                full_response += chunk
-                                print(f"Streaming chunk: {chunk[:50]}...")  # Debug print
+                                response_parts.append(chunk)
                                 # Update UI in real-time during streaming
-                                GLib.idle_add(self.update_streaming_message, chunk)
+                                GLib.idle_add(self.update_streaming_message, chunk, request)
                             
                             # Check if this is the final chunk
                             if json_response.get("done", False):
+                                done = True
                                 break
                         except Exception as e:
-                            print(f"Error parsing JSON line: {e}")
+                            logger.error(f"Error parsing JSON line: {e}")
                             continue
-                return full_response if full_response else "(No response)"
-            return "Error: Could not generate response"
+                full_response = "".join(response_parts)
+                return (full_response if full_response else "(No response)"), done
         except Exception as e:
-            return f"Error: {str(e)}"
+            return f"Error: {str(e)}", False
+        finally:
+            self._active_response = None
 
-    def update_streaming_message(self, chunk):
+    def update_streaming_message(self, chunk, request):
         """Update the streaming message with new chunk of text"""
-        print(f"update_streaming_message called with chunk: {chunk[:30]}...")
-        if not self.is_generating:
-            print("Not generating, returning")
+        if request is not self._active_request or request.is_set():
             return
         
         self.streaming_response += chunk
-        print(f"Total streaming response so far: {len(self.streaming_response)} chars")
-        # Update the UI with JavaScript injection for better performance
+        # Coalesce chunks so the WebView is updated at most once per frame
+        if not self._stream_flush_id:
+            self._stream_flush_id = GLib.timeout_add(STREAM_FLUSH_INTERVAL_MS, self._flush_streaming)
+
+    def _flush_streaming(self):
+        """Show the buffered streaming text in the WebView"""
+        self._stream_flush_id = 0
         self.update_streaming_webview(self.streaming_response)
         # Also update the messages list
         if self.messages and self.messages[-1][0] == "assistant":
             self.messages[-1] = ("assistant", self.streaming_response)
+        return False
+
+    def _cancel_streaming_flush(self):
+        """Drop any pending streaming render"""
+        if self._stream_flush_id:
+            GLib.source_remove(self._stream_flush_id)
+            self._stream_flush_id = 0
 
     def update_streaming_webview(self, full_text):
-        """Update the streaming WebView using JavaScript for better performance"""
-        if hasattr(self, 'streaming_webview') and self.streaming_webview:
+        """Show the not yet shown part of the streaming text in the chat WebView"""
+        # New text is shown raw at once and completed blocks are swapped for rendered markdown;
+        # finish_streaming_message renders the whole response once at the end
+        if self.streaming_msg_id:
             try:
-                # Convert markdown to HTML
-                html_content = markdown.markdown(safe_decode(full_text))
-                # Properly escape for JavaScript string literal
-                escaped_html = html_content.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
-                # Update the content using JavaScript and then recalculate height
-                js_code = f'''
-                var textElement = document.querySelector(".text");
-                if (textElement) {{
-                    textElement.innerHTML = "{escaped_html}";
-                }}
-                document.body.scrollHeight;
-                '''
-                print(f"Executing JS: {js_code[:100]}...")  # Debug print
-                self.streaming_webview.run_javascript(
-                    js_code, 
-                    None, 
-                    lambda webview, result, user_data: self.update_streaming_height(webview, result),
-                    None
-                )
+                delta = full_text[self._stream_sent_len:]
+                # Hold back whitespace-only tails; they are sent with the next word
+                if not delta or delta.isspace():
+                    return
+                msg_id = json.dumps(self.streaming_msg_id)
+                js_code = f"appendStreamText({msg_id}, {json.dumps(delta)});"
+                if self._stream_sent_len == 0:
+                    # First chunk replaces the thinking placeholder
+                    self._message_contents.pop(self.streaming_msg_id, None)
+                    js_code = f"startStream({msg_id});" + js_code
+                self._stream_sent_len = len(full_text)
+                logger.debug("Executing JS: %.100s...", js_code)
+                self._run_chat_js(js_code)
+                # Newly completed blocks are rendered on the markdown worker and swapped in later
+                boundary = self._stream_block_boundary(full_text)
+                if boundary > self._stream_rendered_len:
+                    block = full_text[self._stream_rendered_len:boundary]
+                    self._stream_rendered_len = boundary
+                    self.render_markdown_async(block, self._apply_stream_block, self.streaming_msg_id, boundary)
             except Exception as e:
-                print(f"Error updating streaming webview: {e}")
-
-    def update_streaming_height(self, webview, result):
-        """Update the height of the streaming WebView after content change"""
-        try:
-            value = webview.run_javascript_finish(result)
-            js_result = value.get_js_value()
-            height = js_result.to_int32()
-            print(f"Updating streaming WebView height to: {height}")
-            webview.set_size_request(-1, height)
-            # Scroll to bottom to follow the streaming text
-            adj = self.chat_listbox.get_parent().get_vadjustment()
-            GLib.idle_add(adj.set_value, adj.get_upper())
-        except Exception as e:
-            print(f"Error updating streaming height: {e}")
-
-    def update_message(self, row, sender, message):
-        """Update an existing message row with new content"""
-        # Remove the old content
-        for child in row.get_children():
-            row.remove(child)
-        
-        # Add new content
-        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
-        
-        webview = WebKit2.WebView()
-        webview.set_background_color(Gdk.RGBA(0, 0, 0, 0))
-        webview.set_size_request(-1, 1)  # Let it shrink to fit
-
-        html_content = markdown.markdown(safe_decode(message))
-        full_style = get_improved_css_styles()
-
-        if sender == 'user':
-            body_html = f"""
-              <div class="message-container user">
-                <div class="bubble bubble-user"><div class="text">{html_content}</div></div>
-                <div class="avatar">👤</div>
-              </div>
-            """
-        else: # assistant
-            body_html = f"""
-              <div class="message-container assistant">
-                <div class="bubble bubble-assistant">
-                  <div class="avatar">🧘</div>
-                  <div class="text">{html_content}</div>
-                </div>
-              </div>
-            """
-        
-        html = f'<html><head><meta charset="UTF-8">{full_style}</head><body>{body_html}</body></html>'
-        
-        print("HTML being loaded into WebView:")
-        print(html)
-        webview.load_html(html, "file:///")
-        webview.set_hexpand(True)
-        webview.set_vexpand(False)
-
-        def on_load_changed(webview, load_event):
-            if load_event == WebKit2.LoadEvent.FINISHED:
-                # This JS returns the height of the body content
-                webview.run_javascript(
-                    "document.body.scrollHeight;",
-                    None,
-                    lambda webview, result, user_data: set_webview_height(webview, result),
-                    None
-                )
+                logger.error(f"Error updating streaming webview: {e}")
+
+    def _stream_block_boundary(self, full_text):
+        """Return the end of the last complete markdown block in the streaming text"""
+        boundary = full_text.rfind("\n\n", self._stream_rendered_len)
+        if boundary >= 0 and full_text.count("```", 0, boundary) % 2:
+            # A blank line inside an open code fence does not end a block; fall back to
+            # the last blank line before the fence was opened
+            fence = full_text.rfind("```", 0, boundary)
+            boundary = full_text.rfind("\n\n", self._stream_rendered_len, fence)
+        return max(boundary, self._stream_rendered_len)
+
+    def _apply_stream_block(self, html_content, msg_id, boundary):
+        """Move a rendered block in front of the raw streaming tail"""
+        if html_content is None:  # Rendering failed; the block stays raw until the final render
+            return False
+        if msg_id != self.streaming_msg_id:  # The stream already finished or was stopped
+            return False
+        # The tail may have grown while the block was rendering; keep everything shown after it
+        rest = self.streaming_response[boundary:self._stream_sent_len].lstrip()
+        self._run_chat_js(f"commitStreamBlock({json.dumps(msg_id)}, {json.dumps(html_content)}, "
+                          f"{json.dumps(rest)});")
+        return False
 
-        def set_webview_height(webview, result):
-            value = webview.run_javascript_finish(result)
-            js_result = value.get_js_value()
-            height = js_result.to_int32()
-            print(f"Setting WebView height to: {height}")
-            webview.set_size_request(-1, height)
+    def render_markdown_async(self, message, callback, *args):
+        """Render message on the markdown worker and pass the HTML to callback on the main thread
 
-        webview.connect("load-changed", on_load_changed)
+        callback receives None instead of the HTML if rendering failed.
+        """
+        def on_rendered(future):
+            if future.cancelled():
+                return
+            try:
+                html_content = future.result()
+            except Exception as e:
+                logger.error(f"Error rendering markdown: {e}")
+                html_content = None
+            GLib.idle_add(callback, html_content, *args)
+
+        self._md_executor.submit(_render_md, safe_decode(message)).add_done_callback(on_rendered)
+
+    def finish_streaming_message(self, response, request):
+        """Render the completed response as markdown in place of the raw streamed text"""
+        if request is not self._active_request or request.is_set():  # Stop already replaced the message
+            return False
+        self._cancel_streaming_flush()
+        self.streaming_msg_id = None
+        if response.startswith("Error:") and self.streaming_response:
+            # The stream broke off; keep the partial reply and note the error below it
+            response = f"{self.streaming_response}\n\n{response}"
+        # Replace the thinking placeholder or streamed text in the stored messages
+        if self.messages and self.messages[-1][0] == "assistant":
+            self.messages[-1] = ("assistant", response)
+        self.update_message(self.thinking_msg_id, "assistant", response)
+        return False
 
-        hbox.pack_start(webview, True, True, 0)
-        
-        row.add(hbox)
-        row.show_all()
-        adj = self.chat_listbox.get_parent().get_vadjustment()
-        GLib.idle_add(adj.set_value, adj.get_upper())
+    def update_message(self, msg_id, sender, message):
+        """Update an existing message in the chat with new content"""
+        content = (sender, message)
+        if self._message_contents.get(msg_id) == content:
+            return  # Already shown (or being rendered) with this exact content
+        self._message_contents[msg_id] = content
+        self.render_markdown_async(message, self._apply_message_update, msg_id, sender, message)
+
+    def _apply_message_update(self, html_content, msg_id, sender, message):
+        """Show the rendered content of an updated message"""
+        if html_content is None:
+            # Rendering failed; forget the content so the same update can be retried
+            if self._message_contents.get(msg_id) == (sender, message):
+                del self._message_contents[msg_id]
+            return False
+        if self._message_senders.get(msg_id) == sender:
+            # Same bubble: only swap the text content, keeping the rest of the DOM in place
+            logger.debug("HTML being set in chat:\n%s", html_content)
+            self._run_chat_js(f"setMessageText({json.dumps(msg_id)}, {json.dumps(html_content)});")
+            return False
+        body_html = self._message_html(msg_id, sender, html_content)
+
+        logger.debug("HTML being replaced in chat:\n%s", body_html)
+        self._run_chat_js(f"replaceMessage({json.dumps(msg_id)}, {json.dumps(body_html)});")
+        self._message_senders[msg_id] = sender
+        return False
 
     def on_settings_clicked(self, widget):
         """Handle the settings button click event."""
@@ -817,7 +1066,7 @@ class TalkToKChatWidget(Gtk.Window):
         if response == Gtk.ResponseType.OK:
             # Save settings
             self.text_model = model_entry.get_text()
-            print(f"Model updated to: {self.text_model}")
+            logger.info(f"Model updated to: {self.text_model}")
             
         dialog.destroy()
 
@@ -837,27 +1086,25 @@ class TalkToKChatWidget(Gtk.Window):
         if response == Gtk.ResponseType.YES:
             self.conversation_history.clear()
             self.messages.clear()
-            self.chat_listbox.foreach(lambda widget: self.chat_listbox.remove(widget))
-            welcome_msg = ("We begin again, as if for the first time. "
-                          "In this space of inquiry, what questions naturally arise about the nature of consciousness, "
-                          "about freedom, about the very ground of existence itself?")
-            self.append_message("assistant", welcome_msg)
+            self.streaming_msg_id = None
+            self._message_senders.clear()
+            self._message_contents.clear()
+            self._run_chat_js("clearChat();")
+            self.append_message("assistant", RESET_MESSAGE)
             # Show suggestions again after reset with new random selection
             self.create_random_suggestions()
             self.suggestions_container.show_all()
         dialog.destroy()
 
     def on_input_text_changed(self, buffer):
-        # Implement placeholder functionality
-        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
-        if text == "":
+        # Implement placeholder functionality using the buffer's cached
+        # character count instead of copying the whole text on every edit
+        if self._setting_placeholder:
+            return
+        if buffer.get_char_count() == 0:
             # Text is empty, show placeholder
             if not self.is_placeholder_active:
-                self.is_placeholder_active = True
-                buffer.set_text(self.placeholder_text)
-        elif text == self.placeholder_text:
-            # Text is placeholder, mark as placeholder active
-            self.is_placeholder_active = True
+                self.show_placeholder(buffer)
         else:
             # Text is actual content
             self.is_placeholder_active = False
@@ -872,8 +1119,7 @@ class TalkToKChatWidget(Gtk.Window):
         # Clear placeholder when typing
         if self.is_placeholder_active:
             buffer = widget.get_buffer()
-            if event.keyval not in [Gdk.KEY_Tab, Gdk.KEY_Shift_L, Gdk.KEY_Shift_R, 
-                                   Gdk.KEY_Control_L, Gdk.KEY_Control_R, Gdk.KEY_Alt_L, Gdk.KEY_Alt_R]:
+            if event.keyval not in _IGNORED_PLACEHOLDER_KEYS:
                 buffer.set_text("")
                 self.is_placeholder_active = False
         
@@ -882,58 +1128,63 @@ class TalkToKChatWidget(Gtk.Window):
     def on_input_focus_in(self, widget, event):
         # Clear placeholder when focusing in
         if self.is_placeholder_active:
-            buffer = widget.get_buffer()
-            text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
-            if text == self.placeholder_text:
-                buffer.set_text("")
-                self.is_placeholder_active = False
+            widget.get_buffer().set_text("")
+            self.is_placeholder_active = False
         return False
 
     def on_input_focus_out(self, widget, event):
         # Show placeholder when focusing out if empty
         buffer = widget.get_buffer()
-        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True).strip()
-        if text == "":
-            buffer.set_text(self.placeholder_text)
-            self.is_placeholder_active = True
+        if buffer.get_char_count() == 0:
+            self.show_placeholder(buffer)
         return False
 
+    def show_placeholder(self, buffer):
+        # The placeholder text must not be mistaken for user input by the
+        # changed handler while it is being inserted
+        self._setting_placeholder = True
+        try:
+            buffer.set_text(self.placeholder_text)
+        finally:
+            self._setting_placeholder = False
+        self.is_placeholder_active = True
+
     def setup_placeholder(self):
         # Initialize placeholder functionality
-        buffer = self.input_textview.get_buffer()
-        buffer.set_text(self.placeholder_text)
-        self.is_placeholder_active = True
+        self.show_placeholder(self.input_textview.get_buffer())
 
     def create_random_suggestions(self):
-        """Create 3 random suggestion buttons from the available prompts."""
-        # Clear existing suggestions
-        for child in self.suggestions_grid.get_children():
-            self.suggestions_grid.remove(child)
+        """Show 3 random suggestions from the available prompts on the pooled buttons."""
+        # Build the buttons once; later calls only relabel and rebind them
+        if not self._suggestion_pool:
+            for _ in range(3):
+                suggestion_button = Gtk.Button()
+                suggestion_button.set_name("suggestion_button")
+                suggestion_button.set_relief(Gtk.ReliefStyle.NONE)
+                
+                # Create label with text wrapping
+                label = Gtk.Label()
+                label.set_name("suggestion_label")
+                label.set_line_wrap(True)
+                label.set_line_wrap_mode(Pango.WrapMode.WORD_CHAR)
+                label.set_max_width_chars(35)  # Increased since we have more space with 3 buttons
+                label.set_justify(Gtk.Justification.CENTER)
+                suggestion_button.add(label)
+                
+                self.suggestions_grid.add(suggestion_button)
+                self._suggestion_pool.append([suggestion_button, label, None])
+            self.suggestions_grid.show_all()
         
         # Randomly select 3 suggestions
         selected_suggestions = random.sample(self.all_prompt_suggestions, 3)
         
-        # Create buttons for the selected suggestions
-        for display_text, full_prompt in selected_suggestions:
-            suggestion_button = Gtk.Button()
-            suggestion_button.set_name("suggestion_button")
-            suggestion_button.set_relief(Gtk.ReliefStyle.NONE)
-            
-            # Create label with text wrapping
-            label = Gtk.Label(display_text)
-            label.set_name("suggestion_label")
-            label.set_line_wrap(True)
-            label.set_line_wrap_mode(Pango.WrapMode.WORD_CHAR)
-            label.set_max_width_chars(35)  # Increased since we have more space with 3 buttons
-            label.set_justify(Gtk.Justification.CENTER)
-            suggestion_button.add(label)
-            
-            # Connect click handler
-            suggestion_button.connect("clicked", self.on_suggestion_clicked, full_prompt)
-            self.suggestions_grid.add(suggestion_button)
-        
-        # Show all the new buttons
-        self.suggestions_grid.show_all()
+        for slot, (display_text, full_prompt) in zip(self._suggestion_pool, selected_suggestions):
+            suggestion_button, label, handler_id = slot
+            label.set_text(display_text)
+            # Rebind the click handler to the new prompt
+            if handler_id is not None:
+                suggestion_button.disconnect(handler_id)
+            slot[2] = suggestion_button.connect("clicked", self.on_suggestion_clicked, full_prompt)
 
     def on_suggestion_clicked(self, widget, full_prompt):
         """Handle suggestion button click by filling input and sending the message."""
@@ -948,6 +1199,7 @@ class TalkToKChatWidget(Gtk.Window):
         self.on_send_clicked(widget)
 
 def main():
+    logging.basicConfig(level=logging.INFO)
     win = TalkToKChatWidget()
     win.connect("destroy", Gtk.main_quit)
     Gtk.main()